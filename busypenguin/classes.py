@@ -1,16 +1,125 @@
-import datetime
+import asyncio
+import io
+import json
+import logging
+import threading
+import time
 import traceback
-from slackclient import SlackClient
+from concurrent.futures import ThreadPoolExecutor, wait
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+#: Seconds to wait for further changes before a message is sent to Slack.
+PUBLISH_DELAY = 0.25
+
+#: Seconds a channel name to channel ID resolution is cached for.
+CHANNEL_CACHE_TTL = 600
+
+#: Maximum number of threads used to send blocking updates in the background.
+MAX_WORKERS = 8
+
+#: Maximum number of times a rate limited API call is retried.
+MAX_RETRIES = 5
+
+#: Maximum number of innermost stack frames included in the traceback of a
+#: failed task.
+TRACEBACK_LIMIT = 20
+
+log = logging.getLogger(__name__)
+
+# Maps (access token, '#channel-name') to (channel ID, expiry time).
+_channel_cache = {}
+
+# Maps (client class, access token) to a client shared by all notifiers using
+# that token, so their connection pools survive notifiers being recreated.
+_client_cache = {}
+
+# Maps (access token, event loop) to [client with a keep-alive session, number
+# of users], shared by all notifiers using that token on that loop.
+_sessions = {}
+
+
+def _cached_client(cls, access_token):
+    '''Returns the shared client of the given class for an access token.'''
+    key = (cls, access_token)
+    client = _client_cache.get(key)
+    if client is None:
+        client = _client_cache.setdefault(key, cls(token=access_token))
+    return client
+
+
+def _retry_after(error):
+    '''Returns the number of seconds to wait before retrying a rate limited
+    API call, or None if the error was not caused by rate limiting.'''
+    response = error.response
+    if response.status_code != 429 and response.get('error') != 'ratelimited':
+        return None
+    return int(response.headers.get('Retry-After', 1))
+
+
+def _json_dumps(obj):
+    '''Encodes an attachment as JSON, using orjson when it is installed.'''
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
 
 
 class Notifier:
     '''
     The Notifier class is the base busypenguin class.  It takes a Slack bot
     access token, and a channel ID that all messages will be posted to.
+    The channel may also be given as ``#name``, in which case it is resolved to
+    an ID once and cached.
+
+    Both a blocking and an asyncio client are kept, so tasks can be used either
+    as regular context managers or with ``async with``.  The clients are shared
+    between all notifiers using the same access token.  Final task updates
+    from regular context managers are sent from a thread pool, so that tasks
+    finishing together don't wait on each other.  Errors from those sends are
+    logged, but only raised by :py:meth:`flush`, which should be called to wait
+    for them and to find out whether they succeeded.
+
+    While asynchronous tasks are running, their messages are published through
+    a pooled keep-alive HTTP session, shared with other notifiers using the
+    same access token, which is closed again when the last of them finishes.
+    Using the notifier itself with ``async with`` keeps the session open across
+    tasks.
     '''
+    __slots__ = ('channel', '_token', '_client', '_async_client', '_channel_id', '_channel_lock',
+                 '_executor', '_futures')
+
     def __init__(self, access_token, channel):
-        self.client = SlackClient(access_token)
         self.channel = channel
+        self._token = access_token
+        self._client = None
+        self._async_client = None
+        self._channel_id = None
+        self._channel_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                            thread_name_prefix='busypenguin')
+        self._futures = set()
+
+    @property
+    def client(self):
+        '''The blocking :py:class:`~slack_sdk.WebClient`, created on first use.'''
+        if self._client is None:
+            self._client = _cached_client(WebClient, self._token)
+        return self._client
+
+    @property
+    def async_client(self):
+        '''The :py:class:`~slack_sdk.web.async_client.AsyncWebClient`, created
+        on first use so that aiohttp is only imported when actually needed.'''
+        if self._async_client is None:
+            from slack_sdk.web.async_client import AsyncWebClient
+            self._async_client = _cached_client(AsyncWebClient, self._token)
+        return self._async_client
 
     def task(self, *args, **kwargs):
         '''Creates a :py:class:`Task` object, and passes along all arguments.
@@ -19,6 +128,151 @@ class Notifier:
             A :py:class:`Task` object.'''
         return Task(self, *args, **kwargs)
 
+    def submit(self, fn, *args, **kwargs):
+        '''Runs a blocking call in the notifier's thread pool.
+
+        Returns:
+            A :py:class:`concurrent.futures.Future` for the call.'''
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        if future.cancelled():
+            self._futures.discard(future)
+        elif future.exception() is None:
+            self._futures.discard(future)
+        else:
+            # Kept around so that flush() can raise it as well.
+            log.error('Background Slack call failed', exc_info=future.exception())
+
+    def flush(self):
+        '''Waits for all calls submitted to the thread pool to finish, and
+        re-raises the first error any of them encountered.  Any further errors
+        are raised by subsequent flushes.'''
+        futures = list(self._futures)
+        self._futures.difference_update(futures)
+        wait(futures)
+        failed = [f for f in futures if not f.cancelled() and f.exception() is not None]
+        if failed:
+            # Keep the remaining failures around for the next flush to report.
+            self._futures.update(failed[1:])
+            failed[0].result()
+
+    def _api_call(self, method, **kwargs):
+        '''Calls a Slack API method, waiting and retrying when rate limited.'''
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return self.client.api_call(method, **kwargs)
+            except SlackApiError as e:
+                delay = _retry_after(e)
+                if delay is None or attempt == MAX_RETRIES:
+                    raise
+            time.sleep(delay)
+
+    async def _api_call_async(self, method, **kwargs):
+        '''Asynchronous variant of :py:meth:`_api_call`.'''
+        entry = _sessions.get((self._token, asyncio.get_running_loop()))
+        client = entry[0] if entry else self.async_client
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await client.api_call(method, **kwargs)
+            except SlackApiError as e:
+                delay = _retry_after(e)
+                if delay is None or attempt == MAX_RETRIES:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def gather_tasks(self, *aws):
+        '''Runs the given awaitables, e.g. coroutines using ``async with
+        notifier.task(...)``, concurrently so that their Slack round-trips
+        overlap.  Passes through to :py:func:`asyncio.gather`.'''
+        return await asyncio.gather(*aws)
+
+    async def __aenter__(self):
+        await self._acquire_session()
+        return self
+
+    async def __aexit__(self, etype, value, tb):
+        await self._release_session()
+
+    async def _acquire_session(self):
+        '''Makes asynchronous API calls on the running event loop reuse a single
+        keep-alive session, opening it if needed.  Each call must be paired
+        with :py:meth:`_release_session`.'''
+        key = (self._token, asyncio.get_running_loop())
+        entry = _sessions.get(key)
+        if entry is None:
+            import aiohttp
+            from slack_sdk.web.async_client import AsyncWebClient
+            timeout = self.async_client.timeout
+            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+            client = AsyncWebClient(token=self._token, timeout=timeout, session=session)
+            entry = _sessions[key] = [client, 0]
+        entry[1] += 1
+
+    async def _release_session(self):
+        '''Closes the session once its last user, across all notifiers sharing
+        it, has released it.'''
+        key = (self._token, asyncio.get_running_loop())
+        entry = _sessions[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _sessions[key]
+            await entry[0].session.close()
+
+    @property
+    def channel_id(self):
+        '''The ID of the channel messages are posted to.  Falls back to the
+        channel as given if it can't be resolved.'''
+        if self._channel_id is None:
+            with self._channel_lock:
+                if self._channel_id is None:
+                    channel_id = self._resolve_channel()
+                    if channel_id is None:
+                        # The failure is cached in _channel_cache instead, so
+                        # the lookup is retried once that entry expires.
+                        return self.channel
+                    self._channel_id = channel_id
+        return self._channel_id
+
+    def _resolve_channel(self):
+        '''Returns the ID of the channel, or None if looking it up failed.'''
+        if not self.channel.startswith('#'):
+            return self.channel
+
+        key = (self._token, self.channel)
+        now = time.monotonic()
+        cached = _channel_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        channels = {}
+        try:
+            for page in self.client.conversations_list(types='public_channel,private_channel',
+                                                       exclude_archived=True,
+                                                       limit=1000):
+                for channel in page['channels']:
+                    channels['#'+channel['name']] = channel['id']
+        except SlackApiError:
+            # E.g. the token lacks the channels:read/groups:read scopes, but
+            # chat.postMessage still accepts the channel name.
+            _channel_cache[key] = (None, now + CHANNEL_CACHE_TTL)
+            return None
+
+        expiry = now + CHANNEL_CACHE_TTL
+        for (name, channel_id) in channels.items():
+            _channel_cache[(self._token, name)] = (channel_id, expiry)
+        # Let Slack report unknown channels when posting rather than failing here.
+        return channels.get(self.channel, self.channel)
+
+    async def _resolve_channel_async(self):
+        if self._channel_id is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: self.channel_id)
+        return self._channel_id
+
 
 class Task:
     '''
@@ -34,6 +288,8 @@ class Task:
     :param str text: Body text of task message.
     :param bool status_prefix: Whether to add "Started"/"Finished" to body text automatically.
     '''
+    __slots__ = ('notifier', 'text', 'status_prefix', 'message', 'done', 'start_time', 'end_time',
+                 '_finished_text', '_failed_text')
 
     def __init__(self,
                  notifier,
@@ -44,54 +300,105 @@ class Task:
                  actions=None,
                  status_prefix=True):
         self.notifier = notifier
-        self.text = text[0].lower() + text[1:] if text else None
+        if text and text[0].isupper():
+            self.text = text[0].lower() + text[1:]
+        else:
+            self.text = text or None
         self.status_prefix = status_prefix
-        if status_prefix:
-            text = 'Started '+self.text if self.text else None
+        if status_prefix and self.text:
+            text = f'Started {self.text}'
+            self._finished_text = f'Finished {self.text}'
+            self._failed_text = f'Failed {self.text}'
+        else:
+            if status_prefix:
+                text = None
+            self._finished_text = self._failed_text = self.text
         self.message = Message(notifier, color, title, text, callback_id, actions)
         self.done = False
 
     def __enter__(self):
         self.message.publish()
-        self.start_time = datetime.datetime.utcnow()
+        self.start_time = time.monotonic()
         return self
 
     def __exit__(self, etype, value, tb):
-        self.end_time = datetime.datetime.utcnow()
-        total_seconds = (self.end_time - self.start_time).total_seconds()
+        self._finish(etype, value, tb)
+        self.message._mark_dirty()
+        self.notifier.submit(self.message.flush)
+
+    async def __aenter__(self):
+        await self.notifier._acquire_session()
+        await self.message.publish_async()
+        self.start_time = time.monotonic()
+        return self
+
+    async def __aexit__(self, etype, value, tb):
+        try:
+            self._finish(etype, value, tb)
+            self.message._mark_dirty()
+            await self.message.flush_async()
+        finally:
+            await self.notifier._release_session()
+
+    def _finish(self, etype, value, tb):
+        '''Updates the message to reflect the final state of the task.'''
+        self.end_time = time.monotonic()
+        total_seconds = self.end_time - self.start_time
         (minutes, seconds) = divmod(total_seconds, 60)
-        self.text += f' (took {minutes:.0f}m {seconds:02.02f}s)'
 
         if self.done:
-            self.message.publish()
             return
 
+        self.message.add_field(title='Duration',
+                               value=f'{int(minutes)}m {seconds:05.2f}s',
+                               short=True)
+
         if etype:
-            text = 'Failed '+self.text if self.status_prefix and self.text else self.text
-            self.message.update(color='danger', text=text)
+            self.message.update(color='danger', text=self._failed_text)
 
+            buf = io.StringIO()
+            traceback.print_exception(etype, value, tb, limit=-TRACEBACK_LIMIT, file=buf)
             tb_attachment = {'color': 'danger',
                              'title': 'Previous task raised following exception:',
-                             'text': ''.join(traceback.format_exception(etype, value, tb))}
+                             'text': buf.getvalue()}
             self.message.add_attachment(tb_attachment)
         else:
-            text = 'Finished '+self.text if self.status_prefix and self.text else self.text
-            self.message.update(color='good', text=text)
-        self.message.publish()
+            self.message.update(color='good', text=self._finished_text)
 
     def publish(self):
         '''Trigger message to be published or updated on Slack.'''
         self.message.publish()
 
+    async def publish_async(self):
+        '''Asynchronous variant of :py:meth:`publish`.'''
+        await self.message.publish_async()
+
     def subtask(self, *args, **kwargs):
         '''Create a :py:class:`Subtask` and passes all arguments to it.'''
         return Subtask(self, *args, **kwargs)
 
-    def update(self, *args, **kwargs):
+    def subtasks(self, texts, short=False):
+        '''Creates subtasks for all the given texts up front and yields them in
+        order, to be used as context managers.  The message is published once
+        when the subtasks are added and once more after the last one, rather
+        than on every subtask entry and exit::
+
+            for subtask in task.subtasks(['Build', 'Test', 'Deploy']):
+                with subtask:
+                    ...
+        '''
+        subtasks = [_BulkSubtask(self, text, short) for text in texts]
+        self.message.publish()
+        try:
+            yield from subtasks
+        finally:
+            self.message.publish()
+
+    def update(self, **kwargs):
         '''Convenience method for updating the associated :py:class:`Message` instance.
-        Passes all arguments to :py:meth:`Message.update`.
+        Passes all keyword arguments to :py:meth:`Message.update`.
         '''
-        self.message.update(*args, **kwargs)
+        self.message.update(**kwargs)
 
 
 class Subtask:
@@ -99,35 +406,104 @@ class Subtask:
     Represents a subtask belonging to a specific top-level :py:class:`Task` step.
     Subtasks are either in a list or a table field inside the task message.
     '''
+    __slots__ = ('task', 'text', 'short', 'prefix', 'index', '_display')
+
+    _PREFIX_RUNNING = ':arrow_right: '
+    _PREFIX_OK = ':heavy_check_mark: '
+    _PREFIX_FAIL = ':x: '
+
     def __init__(self, task, text, short=False):
         self.task = task
         self.text = text
         self.short = short
-        self.prefix = ':arrow_right: '
+        self.prefix = self._PREFIX_RUNNING
+        self._display = self.prefix + text
 
     def __enter__(self):
-        self.index = self.task.message.add_field(value=self.prefix+self.text, short=self.short)
+        self.index = self.task.message.add_field(value=self._display, short=self.short)
         self.task.message.publish()
         return self
 
     def __exit__(self, type, value, traceback):
-        if type:
-            self.prefix = ':x: '
-        else:
-            self.prefix = ':heavy_check_mark: '
-        self.task.message.update_field(self.index, value=self.prefix+self.text)
-        self.task.message.publish()
+        if self._finish(type):
+            self.task.message.publish()
+
+    async def __aenter__(self):
+        self.index = self.task.message.add_field(value=self._display, short=self.short)
+        await self.task.message.publish_async()
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        if self._finish(type):
+            await self.task.message.publish_async()
+
+    def _finish(self, type):
+        '''Marks the subtask as failed or done, returning whether its field changed.'''
+        prefix = self._PREFIX_FAIL if type else self._PREFIX_OK
+        if prefix == self.prefix:
+            return False
+        self.prefix = prefix
+        self._display = prefix + self.text
+        return self.task.message.update_field(self.index, value=self._display)
 
     def update(self, text):
+        if self._set_text(text):
+            self.task.message.publish()
+
+    async def update_async(self, text):
+        '''Asynchronous variant of :py:meth:`update`.'''
+        if self._set_text(text):
+            await self.task.message.publish_async()
+
+    def _set_text(self, text):
+        '''Updates the subtask text, returning whether its field changed.'''
         if self.text == text:
-            return
+            return False
         self.text = text
-        self.task.message.update_field(self.index, value=self.prefix+self.text)
-        self.task.message.publish()
+        self._display = self.prefix + text
+        return self.task.message.update_field(self.index, value=self._display)
+
+
+class _BulkSubtask(Subtask):
+    '''A :py:class:`Subtask` created through :py:meth:`Task.subtasks`, whose
+    field is added immediately and whose changes are not published on their own.'''
+    __slots__ = ()
+
+    def __init__(self, task, text, short=False):
+        super().__init__(task, text, short)
+        self.index = task.message.add_field(value=self._display, short=short)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self._finish(type)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        self._finish(type)
+
+    def update(self, text):
+        self._set_text(text)
+
+    async def update_async(self, text):
+        self._set_text(text)
 
 
 class Message:
-    '''Represets a single Slack message.'''
+    '''Represets a single Slack message.
+
+    The JSON encoding of each attachment is cached between publishes, so the
+    attachments should only be changed through the methods of this class.
+
+    Blocking and asynchronous sends of a message share one lock, so the message
+    is only posted once and the last update always carries the latest state,
+    whichever way it is published.'''
+    __slots__ = ('notifier', 'main', 'ts', 'channel', '_attachments', '_attachments_json',
+                 '_last_sent_hash', '_dirty', '_pending', '_lock', '_send_lock')
+
     def __init__(self, notifier, color=None, title=None, text=None, callback_id=None, actions=None):
         self.notifier = notifier
         self.main = {'color': color,
@@ -136,44 +512,201 @@ class Message:
                      'fields': [],
                      'callback_id': callback_id,
                      'actions': actions}
-        self.extra = []
+        self._attachments = [self.main]
+        self._attachments_json = [None]
         self.ts = None
+        # The channel ID Slack reports for the posted message, which unlike
+        # channel names is accepted by chat.update.
+        self.channel = None
+        self._last_sent_hash = None
+        self._dirty = False
+        self._pending = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
 
-    def update(self, color=None, title=None, text=None, actions=None):
-        '''Updates any of the message properties.'''
-        for (k, v) in [('color', color), ('title', title), ('text', text), ('actions', actions)]:
-            if v is not None:
-                self.main[k] = v
+    def update(self, *, color=None, title=None, text=None, actions=None):
+        '''Updates any of the message properties.  Properties passed as None are
+        left as is.'''
+        properties = {'color': color, 'title': title, 'text': text, 'actions': actions}
+        with self._lock:
+            self.main.update({k: v for (k, v) in properties.items() if v is not None})
+            self._attachments_json[0] = None
 
     def add_field(self, title=None, value=None, short=None):
-        self.main['fields'].append({'title': title, 'value': value, 'short': short})
-        return len(self.main['fields']) - 1
+        with self._lock:
+            self.main['fields'].append({'title': title, 'value': value, 'short': short})
+            self._attachments_json[0] = None
+            return len(self.main['fields']) - 1
+
+    def update_field(self, index, *, title=None, value=None, short=None):
+        '''Updates any of the properties of the field at the given index.
+        Properties passed as None are left as is.
 
-    def update_field(self, index, title=None, value=None, short=None):
-        for (k, v) in [('title', title), ('value', value), ('short', short)]:
-            if v is not None:
-                self.main['fields'][index][k] = v
+        Returns:
+            Whether any property actually changed.'''
+        properties = {'title': title, 'value': value, 'short': short}
+        with self._lock:
+            field = self.main['fields'][index]
+            changes = {k: v for (k, v) in properties.items() if v is not None and field.get(k) != v}
+            if not changes:
+                return False
+            field.update(changes)
+            self._attachments_json[0] = None
+            return True
 
     def add_attachment(self, attachment):
         '''Adds a Slack attachment to the message and returns its index.'''
-        self.extra.append(attachment)
-        return len(self.extra) - 1
+        with self._lock:
+            self._attachments.append(attachment)
+            self._attachments_json.append(None)
+            return len(self._attachments) - 2
 
     def update_attachment(self, index, attachment):
-        '''Updates a Slack attachment belonging to the message.'''
-        self.extra[index] = attachment
+        '''Updates a Slack attachment belonging to the message.  Negative
+        indices count from the last added attachment.'''
+        with self._lock:
+            count = len(self._attachments) - 1
+            if index < 0:
+                index += count
+            if not 0 <= index < count:
+                raise IndexError('attachment index out of range')
+            self._attachments[index + 1] = attachment
+            self._attachments_json[index + 1] = None
+
+    @property
+    def extra(self):
+        '''The attachments added with :py:meth:`add_attachment`, as a read-only
+        tuple.'''
+        return tuple(self._attachments[1:])
 
     def publish(self):
+        '''Schedules the message to be published or updated on Slack.
+
+        Changes published within :py:data:`PUBLISH_DELAY` seconds of each other
+        are coalesced into a single API call.  Use :py:meth:`flush` to send
+        pending changes right away.  Pending changes are still sent if the
+        interpreter exits before the delay has passed.'''
+        with self._lock:
+            self._dirty = True
+            if self._pending is None:
+                self._pending = threading.Timer(PUBLISH_DELAY, self._delayed_flush)
+                # Interpreter shutdown waits for non-daemon threads, so the
+                # pending update is sent rather than lost.
+                self._pending.daemon = False
+                self._pending.start()
+
+    def _mark_dirty(self):
+        '''Marks the message as changed without scheduling a send, for callers
+        that flush it right away.'''
+        with self._lock:
+            self._dirty = True
+
+    def flush(self):
+        '''Sends any pending changes to Slack and waits for them to be published.
+        Use :py:meth:`flush_async` instead when running in an event loop.'''
+        with self._send_lock:
+            with self._lock:
+                # A scheduled asyncio flush can't safely be cancelled from
+                # another thread, so it is left to find nothing to send.
+                if isinstance(self._pending, threading.Timer):
+                    self._pending.cancel()
+                    self._pending = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+            self._publish_now()
+
+    def _delayed_flush(self):
+        with self._lock:
+            self._pending = None
+        self.flush()
+
+    def _publish_now(self):
         '''Publishes or updates an already published Slack message.
-        This is the only :py:class:`Message` method that sends anything to Slack.'''
-        attachments = [self.main] + self.extra
+        This is the only blocking :py:class:`Message` method that sends anything to Slack.'''
+        attachments = self._serialize()
+        digest = hash(attachments)
         if not self.ts:
-            r = self.notifier.client.api_call('chat.postMessage',
-                                              channel=self.notifier.channel,
-                                              attachments=attachments)
-            self.ts = r['ts']
-        else:
-            r = self.notifier.client.api_call('chat.update',
-                                              channel=self.notifier.channel,
-                                              ts=self.ts,
-                                              attachments=attachments)
+            r = self.notifier._api_call('chat.postMessage',
+                                        data={'channel': self.notifier.channel_id,
+                                              'attachments': attachments})
+            (self.ts, self.channel) = (r['ts'], r['channel'])
+        elif digest != self._last_sent_hash:
+            r = self.notifier._api_call('chat.update',
+                                        data={'channel': self.channel,
+                                              'ts': self.ts,
+                                              'attachments': attachments})
+        self._last_sent_hash = digest
+
+    def _serialize(self):
+        '''Returns the attachments encoded as a JSON array, only re-encoding the
+        attachments that changed since the last call.
+
+        Holds the message lock throughout, so that a change made while encoding
+        can't be overwritten by the stale encoding.'''
+        with self._lock:
+            cache = self._attachments_json
+            for (i, attachment) in enumerate(self._attachments):
+                if cache[i] is None:
+                    cache[i] = _json_dumps(attachment)
+            return '[' + ','.join(cache) + ']'
+
+    async def publish_async(self):
+        '''Asynchronous variant of :py:meth:`publish`, which schedules the
+        update on the running event loop using the notifier's
+        :py:class:`~slack_sdk.web.async_client.AsyncWebClient`.'''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._dirty = True
+            if self._pending is None:
+                self._pending = loop.create_task(self._delayed_flush_async())
+
+    async def flush_async(self):
+        '''Asynchronous variant of :py:meth:`flush`.'''
+        await self._acquire_send_lock()
+        try:
+            with self._lock:
+                if self._pending is not None:
+                    self._pending.cancel()
+                    self._pending = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+            await self._publish_now_async()
+        finally:
+            self._send_lock.release()
+
+    async def _acquire_send_lock(self):
+        # The send lock is shared with blocking flushes running in other
+        # threads, so wait for it in an executor rather than in the event loop.
+        if self._send_lock.acquire(blocking=False):
+            return
+        acquired = asyncio.get_running_loop().run_in_executor(None, self._send_lock.acquire)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The executor thread still takes the lock eventually; hand it back.
+            acquired.add_done_callback(lambda _: self._send_lock.release())
+            raise
+
+    async def _delayed_flush_async(self):
+        await asyncio.sleep(PUBLISH_DELAY)
+        with self._lock:
+            self._pending = None
+        await self.flush_async()
+
+    async def _publish_now_async(self):
+        attachments = self._serialize()
+        digest = hash(attachments)
+        if not self.ts:
+            channel_id = await self.notifier._resolve_channel_async()
+            r = await self.notifier._api_call_async('chat.postMessage',
+                                                    data={'channel': channel_id,
+                                                          'attachments': attachments})
+            (self.ts, self.channel) = (r['ts'], r['channel'])
+        elif digest != self._last_sent_hash:
+            r = await self.notifier._api_call_async('chat.update',
+                                                    data={'channel': self.channel,
+                                                          'ts': self.ts,
+                                                          'attachments': attachments})
+        self._last_sent_hash = digest
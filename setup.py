@@ -13,4 +13,5 @@ setup(name='busypenguin',
 
       packages=find_packages(),
 
-      install_requires=['slackclient'])
+      install_requires=['slack_sdk', 'aiohttp'],
+      extras_require={'orjson': ['orjson']})
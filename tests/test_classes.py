@@ -0,0 +1,155 @@
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import unittest
+from unittest import mock
+
+import busypenguin
+from busypenguin import classes
+
+
+class FakeSlack:
+    '''Records the API calls made by a notifier instead of sending them.'''
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _record(self, method, data):
+        with self._lock:
+            self.calls.append((method, dict(data)))
+        return {'ok': True, 'ts': '1234.5678', 'channel': 'C123'}
+
+    def api_call(self, method, data):
+        time.sleep(self.delay)
+        return self._record(method, data)
+
+    async def api_call_async(self, method, data):
+        await asyncio.sleep(self.delay)
+        return self._record(method, data)
+
+    def methods(self):
+        return [method for (method, data) in self.calls]
+
+
+class NotifierTestCase(unittest.TestCase):
+    delay = 0
+
+    def setUp(self):
+        slack = self.slack = FakeSlack(self.delay)
+
+        def api_call(notifier, method, data):
+            return slack.api_call(method, data)
+
+        async def api_call_async(notifier, method, data):
+            return await slack.api_call_async(method, data)
+
+        for (name, fn) in [('_api_call', api_call),
+                           ('_api_call_async', api_call_async),
+                           ('_acquire_session', mock.AsyncMock()),
+                           ('_release_session', mock.AsyncMock())]:
+            patcher = mock.patch.object(classes.Notifier, name, fn)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.notifier = busypenguin.Notifier('xoxb-token', 'C123')
+
+
+class TestCoalescing(NotifierTestCase):
+    def test_burst_of_publishes_is_sent_once(self):
+        message = busypenguin.Message(self.notifier, text='burst')
+        for i in range(20):
+            message.add_field(value=str(i))
+            message.publish()
+        time.sleep(classes.PUBLISH_DELAY * 3)
+        self.assertEqual(self.slack.methods(), ['chat.postMessage'])
+        self.assertIn('"19"', self.slack.calls[0][1]['attachments'])
+
+    def test_subtasks_are_coalesced(self):
+        with self.notifier.task(text='Loop') as task:
+            for i in range(10):
+                with task.subtask(f'step {i}'):
+                    pass
+        self.notifier.flush()
+        self.assertEqual(self.slack.methods(), ['chat.postMessage'])
+
+    def test_unchanged_message_is_not_resent(self):
+        message = busypenguin.Message(self.notifier, text='same')
+        message.publish()
+        message.flush()
+        message.publish()
+        message.flush()
+        self.assertEqual(self.slack.methods(), ['chat.postMessage'])
+
+
+class TestFinalFlush(NotifierTestCase):
+    def test_task_exit_sends_final_state(self):
+        with self.notifier.task(text='Deploy'):
+            time.sleep(classes.PUBLISH_DELAY * 2)
+        self.notifier.flush()
+        self.assertEqual(self.slack.methods(), ['chat.postMessage', 'chat.update'])
+        (method, data) = self.slack.calls[-1]
+        self.assertIn('Finished deploy', data['attachments'])
+        self.assertEqual(data['channel'], 'C123')
+
+    def test_async_task_exit_sends_final_state(self):
+        async def main():
+            async with self.notifier.task(text='Deploy'):
+                await asyncio.sleep(classes.PUBLISH_DELAY * 2)
+        asyncio.run(main())
+        self.assertEqual(self.slack.methods(), ['chat.postMessage', 'chat.update'])
+        self.assertIn('Finished deploy', self.slack.calls[-1][1]['attachments'])
+
+    def test_pending_publish_is_sent_at_exit(self):
+        script = textwrap.dedent('''
+            from busypenguin import classes
+
+            def api_call(self, method, data):
+                print(method, data['attachments'])
+                return {'ok': True, 'ts': '1', 'channel': 'C123'}
+
+            classes.Notifier._api_call = api_call
+            t = classes.Notifier('xoxb-token', 'C123').task(text='Manual')
+            t.publish()
+        ''')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True,
+                                text=True, check=True).stdout
+        self.assertIn('chat.postMessage', output)
+        self.assertIn('Started manual', output)
+
+
+class TestMixedSends(NotifierTestCase):
+    delay = 0.3
+
+    def test_sync_update_during_async_post_does_not_repost(self):
+        async def main():
+            async with self.notifier.task(text='Mixed') as task:
+                async with task.subtask('first') as subtask:
+                    # Let the async post start, then publish through the
+                    # blocking path while it is still in flight.
+                    await asyncio.sleep(classes.PUBLISH_DELAY + 0.05)
+                    subtask.update('second')
+                    await asyncio.sleep(classes.PUBLISH_DELAY * 2)
+        asyncio.run(main())
+        self.assertEqual(self.slack.methods().count('chat.postMessage'), 1)
+        self.assertIn('second', self.slack.calls[-1][1]['attachments'])
+
+
+class TestMessage(unittest.TestCase):
+    def test_update_attachment_negative_index(self):
+        message = busypenguin.Message(None, text='main')
+        message.add_attachment({'text': 'a'})
+        message.add_attachment({'text': 'b'})
+        message.update_attachment(-1, {'text': 'c'})
+        self.assertEqual(message.main['text'], 'main')
+        self.assertEqual(message.extra, ({'text': 'a'}, {'text': 'c'}))
+        with self.assertRaises(IndexError):
+            message.update_attachment(-3, {})
+
+
+if __name__ == '__main__':
+    unittest.main()